@@ -7,13 +7,22 @@ A terminal-style application for interactive Python execution with full keyboard
 import sys
 import os
 import io
+import builtins
+import ast
 import traceback
 import contextlib
+import itertools
+import keyword
+import threading
 import urllib.request
-import urllib.error
 import urllib.parse
 import json
 import re
+import bisect
+import heapq
+from collections import OrderedDict, deque
+from pathlib import Path
+from types import CodeType
 from typing import List, Optional, Any
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QTextEdit, QVBoxLayout, QWidget,
@@ -21,12 +30,13 @@ from PyQt6.QtWidgets import (
     QTextBrowser, QSplitter, QFrame, QProgressDialog, QPushButton,
     QSizePolicy, QSlider, QLineEdit, QInputDialog
 )
-from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QThread, pyqtSlot, QEvent
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QThread, pyqtSlot, QEvent, QUrl
 from PyQt6.QtGui import (
     QFont, QTextCursor, QTextCharFormat, QColor, QKeySequence,
     QAction, QPalette, QSyntaxHighlighter, QTextDocument, QIcon,
-    QPainter, QPen, QLinearGradient, QClipboard
+    QPainter, QLinearGradient, QClipboard, QPixmap
 )
+from PyQt6.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
 
 
 HTTP_HEADERS = {
@@ -34,6 +44,61 @@ HTTP_HEADERS = {
     "Accept": "text/plain,text/x-python,text/*;q=0.9,*/*;q=0.8",
 }
 
+# QTextBlock user states used to tell the highlighters which lines to skip
+INPUT_STATE = 0   # Prompt lines
+OUTPUT_STATE = 1  # Program output and system messages
+
+# Python keywords, taken from the running interpreter (includes True/False/None/async/await)
+_PY_KEYWORDS = frozenset(keyword.kwlist)
+
+# Patterns for highlighting Python code echoed in the output area
+_KEYWORD_RE = re.compile(r'\b(?:' + '|'.join(map(re.escape, sorted(_PY_KEYWORDS))) + r')\b')
+# Strings and comments come first so keywords and numbers inside them never match.
+# Lines are split by U+2029 in QTextCursor.selectedText(), so comments stop there too.
+_HIGHLIGHT_RE = re.compile(
+    r'(?P<string>"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')'
+    r'|(?P<comment>#[^\n\u2029]*)'
+    r'|(?P<keyword>' + _KEYWORD_RE.pattern + ')'
+    r'|(?P<number>\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b)'
+)
+# Output without any of these has nothing to highlight, so it isn't worth parsing
+_LIKELY_CODE_RE = re.compile(r'[\d\'"#]|' + _KEYWORD_RE.pattern)
+
+# Body font stack for the README viewer
+_MD_BODY_FONTS = ['-apple-system', 'BlinkMacSystemFont', 'Segoe UI', 'Roboto', 'sans-serif']
+
+
+def _ends_inside_string(code: str) -> bool:
+    """Return True if code stops partway through a string literal"""
+    quote = None  # Delimiter of the string we're in: ', ", ''' or """
+    i = 0
+    length = len(code)
+    while i < length:
+        ch = code[i]
+        if quote:
+            if ch == '\\':
+                i += 2  # Skip the escaped character
+                continue
+            if code.startswith(quote, i):
+                i += len(quote)
+                quote = None
+                continue
+            if ch == '\n' and len(quote) == 1:
+                quote = None  # Single-quoted strings can't span lines
+        elif ch == '#':
+            # Skip the comment up to the end of its line
+            newline = code.find('\n', i)
+            if newline == -1:
+                return False
+            i = newline
+            continue
+        elif ch in '"\'':
+            quote = ch * 3 if code.startswith(ch * 3, i) else ch
+            i += len(quote)
+            continue
+        i += 1
+    return quote is not None
+
 
 def normalize_script_url(url: str) -> str:
     """Normalize known host URL patterns to direct script content URLs."""
@@ -66,40 +131,30 @@ def fetch_text_url(url: str, timeout: int = 10) -> tuple[str, str]:
         return response.read().decode("utf-8"), resolved_url
 
 
+PYCO_URL = "https://raw.githubusercontent.com/LeeHolmes/pyco/refs/heads/main/pyco.py"
+README_URL = "https://raw.githubusercontent.com/LeeHolmes/pyco/refs/heads/main/README.md"
+
+_CRLF_RE = re.compile(r'\r\n?')  # CRLF or lone CR, normalized to LF in one pass
+_CRLF_BYTES_RE = re.compile(rb'\r\n?')
+
+
+def _read_text(path: str) -> str:
+    """Read a whole UTF-8 file with unbuffered os.read calls, translating newlines like text mode"""
+    fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        # Ask for the whole file at once, but os.read may return less (e.g. on network
+        # drives), so keep reading until EOF
+        size = max(os.fstat(fd).st_size, 65536)
+        chunks = []
+        while chunk := os.read(fd, size):
+            chunks.append(chunk)
+    finally:
+        os.close(fd)
+    text = b''.join(chunks).decode('utf-8')
+    if '\r' in text:
+        text = _CRLF_RE.sub('\n', text)
+    return text
 
-class PycoDownloader(QThread):
-    """Thread for downloading pyco.py and README.md from GitHub"""
-    download_finished = pyqtSignal(bool, str)  # success, message
-    
-    def __init__(self, install_dir: str):
-        super().__init__()
-        self.install_dir = install_dir
-        self.pyco_url = "https://raw.githubusercontent.com/LeeHolmes/pyco/refs/heads/main/pyco.py"
-        self.readme_url = "https://raw.githubusercontent.com/LeeHolmes/pyco/refs/heads/main/README.md"
-        
-    def run(self):
-        """Download pyco.py and README.md from GitHub"""
-        try:
-            # Download pyco.py
-            pyco_path = os.path.join(self.install_dir, "pyco.py")
-            content, _ = fetch_text_url(self.pyco_url, timeout=10)
-            content = content.replace('\r\n', '\n').replace('\r', '\n')
-            with open(pyco_path, 'w', encoding='utf-8', newline='\n') as f:
-                f.write(content)
-            
-            # Download README.md
-            readme_path = os.path.join(self.install_dir, "README.md")
-            content, _ = fetch_text_url(self.readme_url, timeout=10)
-            content = content.replace('\r\n', '\n').replace('\r', '\n')
-            with open(readme_path, 'w', encoding='utf-8', newline='\n') as f:
-                f.write(content)
-                
-            self.download_finished.emit(True, "Downloaded pyco.py and README.md")
-            
-        except urllib.error.URLError as e:
-            self.download_finished.emit(False, f"Network error: {e}")
-        except Exception as e:
-            self.download_finished.emit(False, f"Download failed: {e}")
 
 class PycoVersionChecker(QThread):
     """Thread for checking if a new version of pyco is available"""
@@ -108,7 +163,7 @@ class PycoVersionChecker(QThread):
     def __init__(self, install_dir: str):
         super().__init__()
         self.install_dir = install_dir
-        self.pyco_url = "https://raw.githubusercontent.com/LeeHolmes/pyco/refs/heads/main/pyco.py"
+        self.pyco_url = PYCO_URL
         
     def run(self):
         """Check if a newer version is available by comparing file content"""
@@ -121,16 +176,15 @@ class PycoVersionChecker(QThread):
             
             # Download the current version from GitHub
             remote_content, _ = fetch_text_url(self.pyco_url, timeout=10)
-            remote_content = remote_content.replace('\r\n', '\n').replace('\r', '\n')
+            remote_content = _CRLF_RE.sub('\n', remote_content)
             
             # Read local version if it exists
             pyco_path = os.path.join(self.install_dir, "pyco.py")
             if os.path.exists(pyco_path):
-                with open(pyco_path, 'r', encoding='utf-8') as f:
-                    local_content = f.read()
+                local_content = _read_text(pyco_path)
                 
                 # Normalize both contents for comparison (handle line endings, whitespace)
-                local_normalized = local_content.replace('\r\n', '\n').replace('\r', '\n').strip()
+                local_normalized = local_content.strip()
                 remote_normalized = remote_content.strip()
                 
                 # Compare content to see if they're different
@@ -144,35 +198,83 @@ class PycoVersionChecker(QThread):
             # If check fails, assume no update available to avoid bothering user
             self.version_check_finished.emit(False, False)
 
+class _PrefixIndex:
+    """Sorted, immutable name list that answers prefix queries by binary search"""
+    __slots__ = ('names',)
+    
+    def __init__(self, names):
+        self.names = tuple(sorted(names))
+        
+    def keys(self, prefix: str = "") -> List[str]:
+        """Return all names starting with prefix, in sorted order"""
+        names = self.names
+        # Matches form one contiguous run, ending before anything that sorts after
+        # prefix + the highest code point (which no identifier contains)
+        start = bisect.bisect_left(names, prefix)
+        end = bisect.bisect_left(names, prefix + '\U0010ffff', start)
+        return list(names[start:end])
+
+class _ListIO(io.TextIOBase):
+    """Write-only text stream that collects chunks in a list"""
+    # Report the same as the io.StringIO this stands in for
+    encoding = None
+    errors = None
+    
+    def __init__(self):
+        super().__init__()
+        self.buf = []
+        
+    def writable(self) -> bool:
+        return True
+        
+    def write(self, s: str) -> int:
+        if not isinstance(s, str):
+            raise TypeError(f"write() argument must be str, not {type(s).__name__}")
+        self.buf.append(s)
+        return len(s)
+        
+    def getvalue(self) -> str:
+        return ''.join(self.buf)
+        
+    def clear(self):
+        self.buf.clear()
+
 class PythonExecutor(QThread):
     """Thread for executing Python code safely"""
     execution_finished = pyqtSignal(str, bool)  # output, is_error
     input_requested = pyqtSignal(str)  # prompt text
     output_ready = pyqtSignal(str)  # output without prompt insertion
     
+    COMPILE_CACHE_SIZE = 128  # Max compiled snippets kept for history re-runs
+    _NOT_AN_EXPRESSION = object()  # Cached for code that only compiles in 'exec' mode
+    
     def __init__(self):
         super().__init__()
         self.code = ""
         self.globals_dict = {"__name__": "__main__"}
-        self.locals_dict = {}
+        # Run user code at module level in one namespace, like the real REPL
+        self.locals_dict = self.globals_dict
         self.input_response = None
         self.input_event = None
         self.interrupted = False
-        self.initial_globals = set()  # Track what was available before pyco.py
+        self.initial_globals = frozenset()  # Track what was available before pyco.py
+        self.globals_generation = 0  # Bumped whenever globals_dict may have changed
+        self._compile_cache: "OrderedDict[tuple[str, str], CodeType | object]" = OrderedDict()
+        self._sentinel = object()  # Stands in for a missing builtins._
         self.setup_python_environment()
         
     def setup_python_environment(self):
         """Setup Python environment with proper sys module access"""
+        # Globals are being (re)initialized, so drop any previously compiled code
+        self._compile_cache.clear()
+        
         # Make sys and builtins modules available in the globals so displayhook/excepthook can be customized
-        import sys
-        import builtins
         self.globals_dict['sys'] = sys
         self.globals_dict['builtins'] = builtins
         
-        # Record initial state - everything available before pyco.py
-        self.initial_globals = set(self.globals_dict.keys())
-        # Also include Python builtins as part of initial state
-        self.initial_globals.update(name for name in dir(builtins) if not name.startswith('_'))
+        # Record initial state - everything available before pyco.py, plus Python builtins
+        self.initial_globals = frozenset(self.globals_dict).union(
+            name for name in dir(builtins) if not name.startswith('_'))
         
     def set_code(self, code: str):
         self.code = code
@@ -188,6 +290,28 @@ class PythonExecutor(QThread):
         self.interrupted = True
         if self.input_event:
             self.input_event.set()
+    
+    def _compile(self, code: str, mode: str) -> Optional[CodeType]:
+        """Compile code, reusing the cached code object for repeated snippets.
+        
+        Returns None if code isn't an expression when compiling in 'eval' mode.
+        """
+        key = (code, mode)
+        compiled = self._compile_cache.get(key)
+        if compiled is None:
+            try:
+                compiled = compile(code, '<input>', mode)
+            except SyntaxError:
+                if mode != 'eval':
+                    raise  # Shown to the user, so not worth caching
+                # Remember statements too, so re-running one skips straight to 'exec'
+                compiled = self._NOT_AN_EXPRESSION
+            self._compile_cache[key] = compiled
+            if len(self._compile_cache) > self.COMPILE_CACHE_SIZE:
+                self._compile_cache.popitem(last=False)
+        else:
+            self._compile_cache.move_to_end(key)
+        return None if compiled is self._NOT_AN_EXPRESSION else compiled
         
     def run(self):
         """Execute Python code and capture output"""
@@ -202,8 +326,8 @@ class PythonExecutor(QThread):
         old_stdout = sys.stdout
         old_stderr = sys.stderr
         old_stdin = sys.stdin
-        stdout_capture = io.StringIO()
-        stderr_capture = io.StringIO()
+        stdout_capture = _ListIO()
+        stderr_capture = _ListIO()
         
         # Create a custom input function that requests input from the main thread
         def interactive_input(prompt=""):
@@ -211,20 +335,15 @@ class PythonExecutor(QThread):
             pending_output = stdout_capture.getvalue()
             if pending_output:
                 # Clear the capture buffer
-                stdout_capture.seek(0)
-                stdout_capture.truncate(0)
-                # Emit the pending output without inserting a prompt
+                stdout_capture.clear()
+                # Emit the pending output without inserting a prompt. Both this and
+                # input_requested are queued to the UI thread, so they arrive in order.
                 self.output_ready.emit(pending_output)
-                # Small delay to allow UI to update
-                import time
-                time.sleep(0.01)
             
             # Flush any remaining output
             sys.stdout.flush()
             sys.stderr.flush()
             
-            # Import threading here to avoid import issues
-            import threading
             self.input_event = threading.Event()
             self.input_response = None
             
@@ -244,7 +363,6 @@ class PythonExecutor(QThread):
         
         # Initialize old_input before try block to avoid UnboundLocalError
         # Handle both cases where __builtins__ can be a module or dict
-        import builtins
         old_input = getattr(builtins, 'input', input)
         result_value = None  # Initialize result_value in broader scope
         exception_occurred = False  # Track if any exception occurred during execution
@@ -256,62 +374,66 @@ class PythonExecutor(QThread):
             builtins.input = interactive_input
             
             # Try to compile as an expression first (for interactive results)
-            try:
-                compiled = compile(self.code, '<input>', 'eval')
-                result = eval(compiled, self.globals_dict, self.locals_dict)
-                if result is not None:
-                    # Use sys.displayhook if available, otherwise fall back to print(repr())
-                    if hasattr(sys, 'displayhook') and callable(sys.displayhook):
-                        # Save current builtins._ value to detect if displayhook changes it
-                        import builtins
-                        old_underscore = getattr(builtins, '_', object())  # Use sentinel if _ doesn't exist
-                        
-                        displayhook_result = sys.displayhook(result)
-                        
-                        # Check if displayhook modified builtins._ (like CPython's __displayhook__ does)
-                        new_underscore = getattr(builtins, '_', object())
-                        if new_underscore is not old_underscore:
-                            # displayhook set builtins._, sync it with our globals dict
-                            self.globals_dict['_'] = new_underscore
-                            # Clear result_value since _ was already set by displayhook
-                            result_value = None
+            compiled = self._compile(self.code, 'eval')
+            if compiled is not None:
+                try:
+                    result = eval(compiled, self.globals_dict)
+                    if result is not None:
+                        # Use sys.displayhook if available, otherwise fall back to print(repr())
+                        # (looked up each run since pyco.py and user code may replace it)
+                        displayhook = getattr(sys, 'displayhook', None)
+                        if callable(displayhook):
+                            # Save current builtins._ value to detect if displayhook changes it
+                            old_underscore = getattr(builtins, '_', self._sentinel)  # Use sentinel if _ doesn't exist
+                            
+                            displayhook_result = displayhook(result)
+                            
+                            # Check if displayhook modified builtins._ (like CPython's __displayhook__ does)
+                            new_underscore = getattr(builtins, '_', self._sentinel)
+                            if new_underscore is not old_underscore:
+                                # displayhook set builtins._, sync it with our globals dict
+                                self.globals_dict['_'] = new_underscore
+                                # Clear result_value since _ was already set by displayhook
+                                result_value = None
+                            else:
+                                # displayhook didn't set _, use normal logic
+                                result_value = displayhook_result if displayhook_result is not None else result
                         else:
-                            # displayhook didn't set _, use normal logic
-                            result_value = displayhook_result if displayhook_result is not None else result
+                            print(repr(result))
+                            result_value = result  # Store the actual result
+                except KeyboardInterrupt:
+                    raise  # Re-raise to be caught by outer handler
+                except Exception as e:
+                    exception_occurred = True
+                    # Use sys.excepthook if available, otherwise fall back to basic error output
+                    excepthook = getattr(sys, 'excepthook', None)
+                    if callable(excepthook):
+                        excepthook_result = excepthook(type(e), e, e.__traceback__)
+                        # If excepthook returns a value, store it in result_value
+                        if excepthook_result is not None:
+                            result_value = excepthook_result
+                            exception_occurred = False  # Allow updating _ if excepthook returned a value
                     else:
-                        print(repr(result))
-                        result_value = result  # Store the actual result
-            except SyntaxError:
-                # If that fails, try as a statement
+                        stderr_capture.write(f"{type(e).__name__}: {e}\n")
+            else:
+                # Not an expression, so run it as a statement
                 try:
-                    compiled = compile(self.code, '<input>', 'exec')
-                    exec(compiled, self.globals_dict, self.locals_dict)
+                    compiled = self._compile(self.code, 'exec')
+                    exec(compiled, self.globals_dict)
                 except KeyboardInterrupt:
                     raise  # Re-raise to be caught by outer handler
                 except Exception as e:
                     exception_occurred = True
                     # Use sys.excepthook if available, otherwise fall back to basic error output
-                    if hasattr(sys, 'excepthook') and callable(sys.excepthook):
-                        excepthook_result = sys.excepthook(type(e), e, e.__traceback__)
+                    excepthook = getattr(sys, 'excepthook', None)
+                    if callable(excepthook):
+                        excepthook_result = excepthook(type(e), e, e.__traceback__)
                         # If excepthook returns a value, store it in result_value
                         if excepthook_result is not None:
                             result_value = excepthook_result
                             exception_occurred = False  # Allow updating _ if excepthook returned a value
                     else:
                         stderr_capture.write(f"{type(e).__name__}: {e}\n")
-            except KeyboardInterrupt:
-                raise  # Re-raise to be caught by outer handler
-            except Exception as e:
-                exception_occurred = True
-                # Use sys.excepthook if available, otherwise fall back to basic error output
-                if hasattr(sys, 'excepthook') and callable(sys.excepthook):
-                    excepthook_result = sys.excepthook(type(e), e, e.__traceback__)
-                    # If excepthook returns a value, store it in result_value
-                    if excepthook_result is not None:
-                        result_value = excepthook_result
-                        exception_occurred = False  # Allow updating _ if excepthook returned a value
-                else:
-                    stderr_capture.write(f"{type(e).__name__}: {e}\n")
                 
         except KeyboardInterrupt:
             # Handle Ctrl+C interruption specially
@@ -322,8 +444,9 @@ class PythonExecutor(QThread):
         except Exception as e:
             exception_occurred = True
             # Use sys.excepthook if available for top-level execution errors
-            if hasattr(sys, 'excepthook') and callable(sys.excepthook):
-                excepthook_result = sys.excepthook(type(e), e, e.__traceback__)
+            excepthook = getattr(sys, 'excepthook', None)
+            if callable(excepthook):
+                excepthook_result = excepthook(type(e), e, e.__traceback__)
                 # If excepthook returns a value, store it in result_value
                 if excepthook_result is not None:
                     result_value = excepthook_result
@@ -336,6 +459,8 @@ class PythonExecutor(QThread):
             sys.stdin = old_stdin
             # Restore original input function
             builtins.input = old_input
+            # Even interrupted or failing code may have bound new names
+            self.globals_generation += 1
             
         # Get captured output
         stdout_output = stdout_capture.getvalue()
@@ -355,7 +480,6 @@ class PythonExecutor(QThread):
         if not exception_occurred and result_value is not None:
             self.globals_dict['_'] = result_value
             # Also set builtins._ to maintain consistency with CPython
-            import builtins
             builtins._ = result_value
             
         self.execution_finished.emit(output, is_error)
@@ -363,6 +487,9 @@ class PythonExecutor(QThread):
 class PythonSyntaxHighlighter(QSyntaxHighlighter):
     """Smart Python syntax highlighter that only highlights input, not output"""
     
+    # Prompt indicators that mark a line as input (including continuation prompts)
+    _PROMPTS = (">>> ", "... ", "pyco> ")
+    
     def __init__(self, document: QTextDocument, terminal_widget=None):
         super().__init__(document)
         self.terminal_widget = terminal_widget
@@ -379,13 +506,45 @@ class PythonSyntaxHighlighter(QSyntaxHighlighter):
         self.variable_color = QColor(156, 220, 254) # Light blue
         
         # Python keywords
-        self.keywords = [
-            'and', 'as', 'assert', 'break', 'class', 'continue', 'def', 'del',
-            'elif', 'else', 'except', 'finally', 'for', 'from', 'global', 'if',
-            'import', 'in', 'is', 'lambda', 'nonlocal', 'not', 'or', 'pass',
-            'raise', 'return', 'try', 'while', 'with', 'yield', 'True', 'False',
-            'None', 'async', 'await'
-        ]
+        self.keywords = _PY_KEYWORDS
+        
+        # Python operators (word operators are already covered by keywords)
+        operators = ['+', '-', '*', '/', '//', '%', '**', '==', '!=', '<', '>', '<=', '>=', 
+                     '=', '+=', '-=', '*=', '/=', '//=', '%=', '**=', '&', '|', '^', '~', 
+                     '<<', '>>', '&=', '|=', '^=', '<<=', '>>=']
+        
+        # Compile patterns once - highlightBlock runs on every keystroke
+        self._str_re = re.compile(r"'(?:\\.|[^'\\])*'?|\"(?:\\.|[^\"\\])*\"?")
+        self._num_re = re.compile(r'\b(?:0[xX][0-9a-fA-F]+|0[bB][01]+|0[oO][0-7]+|\d+\.?\d*(?:[eE][+-]?\d+)?)\b')
+        self._op_re = re.compile('|'.join(map(re.escape, sorted(operators, key=len, reverse=True))))
+        self._func_re = re.compile(r'\b([a-zA-Z_][a-zA-Z0-9_]*)\s*\(')
+        self._ident_re = re.compile(r'\b[a-zA-Z_][a-zA-Z0-9_]*\b')
+        self._cmt_re = re.compile(r'#.*$')
+        
+        # Build the character formats once instead of per block
+        self._kw_fmt = QTextCharFormat()
+        self._kw_fmt.setForeground(self.keyword_color)
+        self._kw_fmt.setFontWeight(QFont.Weight.Bold)
+        
+        self._str_fmt = QTextCharFormat()
+        self._str_fmt.setForeground(self.string_color)
+        
+        self._num_fmt = QTextCharFormat()
+        self._num_fmt.setForeground(self.number_color)
+        
+        self._op_fmt = QTextCharFormat()
+        self._op_fmt.setForeground(self.operator_color)
+        self._op_fmt.setFontWeight(QFont.Weight.Bold)
+        
+        self._func_fmt = QTextCharFormat()
+        self._func_fmt.setForeground(self.function_color)
+        self._func_fmt.setFontWeight(QFont.Weight.Bold)
+        
+        self._var_fmt = QTextCharFormat()
+        self._var_fmt.setForeground(self.variable_color)
+        
+        self._cmt_fmt = QTextCharFormat()
+        self._cmt_fmt.setForeground(self.comment_color)
         
     def is_input_line(self, text: str) -> bool:
         """Check if this line is user input (starts with prompt)"""
@@ -393,145 +552,77 @@ class PythonSyntaxHighlighter(QSyntaxHighlighter):
             return True  # Default to highlighting if no terminal widget
             
         # Check if line starts with prompt indicators (including continuation prompts)
-        prompt_indicators = [">>> ", "... ", "pyco> "]
-        return any(text.startswith(prompt) for prompt in prompt_indicators)
+        return text.startswith(self._PROMPTS)
         
     def highlightBlock(self, text: str):
+        # Output blocks are tagged when inserted - never highlight them
+        if self.currentBlockState() == OUTPUT_STATE:
+            return
+            
         # Only highlight if this is an input line
         if not self.is_input_line(text):
             return
             
-        # Get the text after the prompt
-        input_text = text
-        input_offset = 0
-        
-        # Find where the actual input starts (after prompt)
-        for prompt in [">>> ", "... ", "pyco> "]:
-            if text.startswith(prompt):
-                input_text = text[len(prompt):]
-                input_offset = len(prompt)
-                break
+        # Find where the actual input starts (after prompt) and get the text after it
+        input_offset = next((len(prompt) for prompt in self._PROMPTS if text.startswith(prompt)), 0)
+        input_text = text[input_offset:]
+        
+        # Local aliases - these are hit for every match on every keystroke
+        set_format = self.setFormat
+        keywords = self.keywords
                 
+        # Tokenize identifiers once - used for keywords here and variables below
+        identifiers = list(self._ident_re.finditer(input_text))
+        
         # Highlight keywords
-        for keyword in self.keywords:
-            format = QTextCharFormat()
-            format.setForeground(self.keyword_color)
-            format.setFontWeight(QFont.Weight.Bold)
-            
-            index = 0
-            while index < len(input_text):
-                index = input_text.find(keyword, index)
-                if index == -1:
-                    break
-                    
-                # Check if it's a whole word
-                if (index == 0 or not input_text[index-1].isalnum()) and \
-                   (index + len(keyword) == len(input_text) or not input_text[index + len(keyword)].isalnum()):
-                    self.setFormat(input_offset + index, len(keyword), format)
-                    
-                index += len(keyword)
+        for match in identifiers:
+            if match.group() in keywords:
+                set_format(input_offset + match.start(), match.end() - match.start(), self._kw_fmt)
                 
-        # Highlight strings
-        string_format = QTextCharFormat()
-        string_format.setForeground(self.string_color)
-        
-        # Single and double quotes
-        for match in ['"', "'"]:
-            index = 0
-            while index < len(input_text):
-                start = input_text.find(match, index)
-                if start == -1:
-                    break
-                end = input_text.find(match, start + 1)
-                if end == -1:
-                    end = len(input_text)
-                else:
-                    end += 1
-                self.setFormat(input_offset + start, end - start, string_format)
-                index = end
+        # Highlight strings, remembering which characters they cover
+        in_string = bytearray(len(input_text))
+        for match in self._str_re.finditer(input_text):
+            start, end = match.span()
+            in_string[start:end] = b'\x01' * (end - start)
+            set_format(input_offset + start, end - start, self._str_fmt)
                 
-        # Highlight numbers (integers, floats, scientific notation)
-        import re
-        number_format = QTextCharFormat()
-        number_format.setForeground(self.number_color)
-        
-        # Match numbers: integers, floats, scientific notation, hex, binary, octal
-        number_pattern = r'\b(?:0[xX][0-9a-fA-F]+|0[bB][01]+|0[oO][0-7]+|\d+\.?\d*(?:[eE][+-]?\d+)?)\b'
-        for match in re.finditer(number_pattern, input_text):
-            self.setFormat(input_offset + match.start(), match.end() - match.start(), number_format)
+        # Highlight numbers (integers, floats, scientific notation, hex, binary, octal)
+        for match in self._num_re.finditer(input_text):
+            set_format(input_offset + match.start(), match.end() - match.start(), self._num_fmt)
         
         # Highlight operators
-        operator_format = QTextCharFormat()
-        operator_format.setForeground(self.operator_color)
-        operator_format.setFontWeight(QFont.Weight.Bold)
-        
-        # Python operators
-        operators = ['+', '-', '*', '/', '//', '%', '**', '==', '!=', '<', '>', '<=', '>=', 
-                    '=', '+=', '-=', '*=', '/=', '//=', '%=', '**=', '&', '|', '^', '~', 
-                    '<<', '>>', '&=', '|=', '^=', '<<=', '>>=', 'and', 'or', 'not', 'in', 'is']
-        
-        for op in operators:
-            if op.isalpha():  # Skip word operators (already handled in keywords)
-                continue
-            index = 0
-            while index < len(input_text):
-                index = input_text.find(op, index)
-                if index == -1:
-                    break
-                self.setFormat(input_offset + index, len(op), operator_format)
-                index += len(op)
+        for match in self._op_re.finditer(input_text):
+            set_format(input_offset + match.start(), match.end() - match.start(), self._op_fmt)
         
         # Highlight function calls (word followed by opening parenthesis)
-        function_format = QTextCharFormat()
-        function_format.setForeground(self.function_color)
-        function_format.setFontWeight(QFont.Weight.Bold)
-        
-        function_pattern = r'\b([a-zA-Z_][a-zA-Z0-9_]*)\s*\('
-        for match in re.finditer(function_pattern, input_text):
+        for match in self._func_re.finditer(input_text):
             # Only highlight the function name, not the parenthesis
-            func_name = match.group(1)
             start_pos = match.start(1)
-            self.setFormat(input_offset + start_pos, len(func_name), function_format)
+            set_format(input_offset + start_pos, match.end(1) - start_pos, self._func_fmt)
         
         # Highlight variables (simple heuristic: words that aren't keywords, functions, or strings)
-        variable_format = QTextCharFormat()
-        variable_format.setForeground(self.variable_color)
-        
-        # Find identifiers that aren't keywords or function calls
-        identifier_pattern = r'\b[a-zA-Z_][a-zA-Z0-9_]*\b'
-        for match in re.finditer(identifier_pattern, input_text):
+        for match in identifiers:
             word = match.group()
             start_pos = match.start()
             
             # Skip if it's a keyword
-            if word in self.keywords:
+            if word in keywords:
                 continue
                 
             # Skip if it's followed by '(' (function call, already highlighted)
-            if start_pos + len(word) < len(input_text) and input_text[start_pos + len(word):].lstrip().startswith('('):
+            if input_text[match.end():].lstrip().startswith('('):
                 continue
                 
-            # Skip if it's inside a string (rough check)
-            in_string = False
-            for quote in ['"', "'"]:
-                quote_positions = [i for i, c in enumerate(input_text) if c == quote]
-                for i in range(0, len(quote_positions), 2):
-                    if i + 1 < len(quote_positions):
-                        if quote_positions[i] <= start_pos < quote_positions[i + 1]:
-                            in_string = True
-                            break
-                if in_string:
-                    break
-                    
-            if not in_string:
-                self.setFormat(input_offset + start_pos, len(word), variable_format)
+            # Skip if it's inside a string
+            if in_string[start_pos]:
+                continue
+                
+            set_format(input_offset + start_pos, len(word), self._var_fmt)
         
         # Highlight comments (do this last to override other highlighting)
-        comment_format = QTextCharFormat()
-        comment_format.setForeground(self.comment_color)
-        comment_index = input_text.find('#')
-        if comment_index != -1:
-            self.setFormat(input_offset + comment_index, len(input_text) - comment_index, comment_format)
+        match = self._cmt_re.search(input_text)
+        if match:
+            set_format(input_offset + match.start(), match.end() - match.start(), self._cmt_fmt)
 
 class JSONSyntaxHighlighter(QSyntaxHighlighter):
     """JSON syntax highlighter that only highlights valid JSON"""
@@ -547,31 +638,72 @@ class JSONSyntaxHighlighter(QSyntaxHighlighter):
         self.keyword_color = QColor(86, 156, 214)   # Blue for true/false/null
         self.bracket_color = QColor(255, 255, 255)  # White for brackets
         
+        # JSON number and keyword patterns
+        self._num_re = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+        self._kw_re = re.compile(r'\b(?:true|false|null)\b')
+        
+        # Build the character formats once instead of per block
+        self._str_fmt = QTextCharFormat()
+        self._str_fmt.setForeground(self.string_color)
+        
+        self._num_fmt = QTextCharFormat()
+        self._num_fmt.setForeground(self.number_color)
+        
+        self._kw_fmt = QTextCharFormat()
+        self._kw_fmt.setForeground(self.keyword_color)
+        self._kw_fmt.setFontWeight(QFont.Weight.Bold)
+        
+        self._bracket_fmt = QTextCharFormat()
+        self._bracket_fmt.setForeground(self.bracket_color)
+        self._bracket_fmt.setFontWeight(QFont.Weight.Bold)
+        
+        # Remember the last validated block so re-highlighting it doesn't re-parse
+        self._last_text = None
+        self._last_valid = False
+        
     def is_valid_json(self, text: str) -> bool:
         """Check if text is valid JSON"""
         text = text.strip()
-        if not text:
+        # Only objects and arrays are worth highlighting - skip the parse for everything else
+        if not text or text[0] not in '{[':
             return False
+        if text == self._last_text:
+            return self._last_valid
         try:
             json.loads(text)
-            return True
-        except (json.JSONDecodeError, ValueError):
-            return False
+            self._last_valid = True
+        except ValueError:  # json.JSONDecodeError is a ValueError
+            self._last_valid = False
+        self._last_text = text
+        return self._last_valid
         
     def highlightBlock(self, text: str):
+        # Output blocks are tagged when inserted - never highlight them
+        if self.currentBlockState() == OUTPUT_STATE:
+            return
+            
         # Only highlight if the entire document block contains valid JSON
         if not self.is_valid_json(text):
             return
             
-        # Highlight JSON strings
-        string_format = QTextCharFormat()
-        string_format.setForeground(self.string_color)
+        # Local aliases - these are hit for every match on every keystroke
+        set_format = self.setFormat
+        bracket_fmt = self._bracket_fmt
         
+        # Single pass: highlight strings and brackets, recording which positions
+        # fall inside a string so the regex passes can check them in O(1)
+        inside = bytearray(len(text))
         in_string = False
         escape_next = False
         start_pos = 0
         
         for i, char in enumerate(text):
+            if in_string:
+                inside[i] = 1
+            elif char in '{}[]':
+                set_format(i, 1, bracket_fmt)
+                continue
+                
             if escape_next:
                 escape_next = False
                 continue
@@ -586,116 +718,94 @@ class JSONSyntaxHighlighter(QSyntaxHighlighter):
                     start_pos = i
                 else:
                     in_string = False
-                    self.setFormat(start_pos, i - start_pos + 1, string_format)
+                    set_format(start_pos, i - start_pos + 1, self._str_fmt)
                     
-        # Highlight JSON numbers
-        number_format = QTextCharFormat()
-        number_format.setForeground(self.number_color)
-        
-        import re
-        # JSON number pattern
-        number_pattern = r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?'
-        for match in re.finditer(number_pattern, text):
-            # Make sure it's not inside a string
-            pos = match.start()
-            if not self.is_inside_string(text, pos):
-                self.setFormat(pos, len(match.group()), number_format)
-                
-        # Highlight JSON keywords (true, false, null)
-        keyword_format = QTextCharFormat()
-        keyword_format.setForeground(self.keyword_color)
-        keyword_format.setFontWeight(QFont.Weight.Bold)
-        
-        for keyword in ['true', 'false', 'null']:
-            index = 0
-            while index < len(text):
-                index = text.find(keyword, index)
-                if index == -1:
-                    break
-                if not self.is_inside_string(text, index):
-                    self.setFormat(index, len(keyword), keyword_format)
-                index += len(keyword)
-                
-        # Highlight brackets and braces
-        bracket_format = QTextCharFormat()
-        bracket_format.setForeground(self.bracket_color)
-        bracket_format.setFontWeight(QFont.Weight.Bold)
-        
-        for char in '{}[]':
-            index = 0
-            while index < len(text):
-                index = text.find(char, index)
-                if index == -1:
-                    break
-                if not self.is_inside_string(text, index):
-                    self.setFormat(index, 1, bracket_format)
-                index += 1
-                
-    def is_inside_string(self, text: str, pos: int) -> bool:
-        """Check if position is inside a JSON string"""
-        in_string = False
-        escape_next = False
-        
-        for i in range(pos):
-            if escape_next:
-                escape_next = False
-                continue
+        # Highlight JSON numbers outside strings
+        for match in self._num_re.finditer(text):
+            if not inside[match.start()]:
+                set_format(match.start(), match.end() - match.start(), self._num_fmt)
                 
-            if text[i] == '\\':
-                escape_next = True
-                continue
-                
-            if text[i] == '"':
-                in_string = not in_string
-                
-        return in_string
+        # Highlight JSON keywords (true, false, null) outside strings
+        for match in self._kw_re.finditer(text):
+            if not inside[match.start()]:
+                set_format(match.start(), match.end() - match.start(), self._kw_fmt)
 
 class CRTEffectsOverlay(QWidget):
     """Overlay widget that draws scanlines and glow effects for retro CRT appearance"""
     
+    # Glow gradient stops, shared by the horizontal and vertical fades - more prominent
+    _GLOW_STOPS = [
+        (0.0, QColor(0, 255, 0, 25)),  # Stronger green glow at edges
+        (0.1, QColor(0, 255, 0, 15)),
+        (0.3, QColor(0, 255, 0, 8)),
+        (0.5, QColor(0, 255, 0, 3)),   # Minimal glow in center
+        (0.7, QColor(0, 255, 0, 8)),
+        (0.9, QColor(0, 255, 0, 15)),
+        (1.0, QColor(0, 255, 0, 25)),
+    ]
+    
+    # 1x2 scanline tile, created on first use (QPixmap needs a running QApplication)
+    _SCANLINE: Optional[QPixmap] = None
+    
     def __init__(self):
         super().__init__()
         self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
         self.setStyleSheet("background: transparent;")
+        # Composed scanlines + glow, rebuilt only when the widget size changes
+        self._cache: Optional[QPixmap] = None
+        self._cache_size = None
+        
+    @classmethod
+    def _scanline_tile(cls) -> QPixmap:
+        """Return the shared tile: a transparent row above a dark scanline row"""
+        if cls._SCANLINE is None:
+            tile = QPixmap(1, 2)
+            tile.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(tile)
+            painter.setPen(QColor(0, 0, 0, 80))  # More visible dark lines
+            painter.drawPoint(0, 1)
+            painter.end()
+            cls._SCANLINE = tile
+        return cls._SCANLINE
         
     def paintEvent(self, event):
-        """Draw scanlines and glow effects"""
+        """Blit the cached scanlines and glow effects"""
+        if self._cache is None or self._cache_size != self.size():
+            self._rebuild_cache()
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing, False)  # Sharp lines for scanlines
+        painter.drawPixmap(0, 0, self._cache)
+        painter.end()
         
-        # Draw more prominent horizontal scanlines
-        pen = QPen(QColor(0, 0, 0, 80))  # More visible dark lines
-        pen.setWidth(1)
-        painter.setPen(pen)
+    def resizeEvent(self, event):
+        """Invalidate the cached overlay when the size changes"""
+        super().resizeEvent(event)
+        self._cache = None
+        self.update()
         
-        # Draw very thin horizontal lines every 2 pixels for authentic CRT look
-        for y in range(1, self.height(), 2):
-            painter.drawLine(0, y, self.width(), y)
+    def _rebuild_cache(self):
+        """Draw scanlines and glow effects into the cached pixmap"""
+        self._cache = QPixmap(self.size())
+        self._cache.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(self._cache)
+        
+        # Very thin horizontal lines every 2 pixels for authentic CRT look
+        painter.drawTiledPixmap(self.rect(), self._scanline_tile())
         
         # Add more prominent overall glow/bloom effect
         painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
         
-        # Horizontal glow gradient (left to right fade) - more prominent
+        # Horizontal glow gradient (left to right fade)
         h_gradient = QLinearGradient(0, 0, self.width(), 0)
-        h_gradient.setColorAt(0.0, QColor(0, 255, 0, 25))  # Stronger green glow at edges
-        h_gradient.setColorAt(0.1, QColor(0, 255, 0, 15))
-        h_gradient.setColorAt(0.3, QColor(0, 255, 0, 8))
-        h_gradient.setColorAt(0.5, QColor(0, 255, 0, 3))   # Minimal glow in center
-        h_gradient.setColorAt(0.7, QColor(0, 255, 0, 8))
-        h_gradient.setColorAt(0.9, QColor(0, 255, 0, 15))
-        h_gradient.setColorAt(1.0, QColor(0, 255, 0, 25))
+        h_gradient.setStops(self._GLOW_STOPS)
         painter.fillRect(self.rect(), h_gradient)
         
-        # Vertical glow gradient (top to bottom fade) - more prominent
+        # Vertical glow gradient (top to bottom fade)
         v_gradient = QLinearGradient(0, 0, 0, self.height())
-        v_gradient.setColorAt(0.0, QColor(0, 255, 0, 25))  # Stronger green glow at top/bottom
-        v_gradient.setColorAt(0.1, QColor(0, 255, 0, 15))
-        v_gradient.setColorAt(0.3, QColor(0, 255, 0, 8))
-        v_gradient.setColorAt(0.5, QColor(0, 255, 0, 3))   # Minimal glow in center
-        v_gradient.setColorAt(0.7, QColor(0, 255, 0, 8))
-        v_gradient.setColorAt(0.9, QColor(0, 255, 0, 15))
-        v_gradient.setColorAt(1.0, QColor(0, 255, 0, 25))
+        v_gradient.setStops(self._GLOW_STOPS)
         painter.fillRect(self.rect(), v_gradient)
+        painter.end()
+        
+        self._cache_size = self.size()
 
 class TerminalWithCRTEffects(QWidget):
     """Container widget that combines terminal with CRT effects overlay"""
@@ -729,10 +839,17 @@ class TerminalWidget(QTextEdit):
     
     command_executed = pyqtSignal(str)
     
+    HISTORY_SIZE = 1000  # Oldest commands drop off once history is full
+    HISTORY_DEDUP_WINDOW = 5  # A command repeating one of this many recent entries moves instead of duplicating
+    MAX_COMPLETIONS = 200  # Longer completion lists are truncated with a "(N more...)" footer
+    
+    # Bound at import so user code reassigning builtins.dir can't break completion
+    _dir = staticmethod(builtins.dir)
+    
     def __init__(self):
         super().__init__()
         self.setup_terminal()
-        self.command_history: List[str] = []
+        self.command_history: "deque[str]" = deque(maxlen=self.HISTORY_SIZE)
         self.history_index = -1
         self.prompt = ">>> "
         self.continuation_prompt = "... "
@@ -748,6 +865,33 @@ class TerminalWidget(QTextEdit):
         self.last_input_cursor_position = None  # Track cursor position in input area
         self.user_navigated_within_input = False  # Track if user has moved within current input
         
+        # Tab completion caches: builtins never change, the rest are valid for one globals generation
+        self._builtin_names = _PrefixIndex(name for name in dir(builtins) if not name.startswith('_'))
+        self._global_names_cache: Optional[tuple[int, _PrefixIndex]] = None  # (generation, index)
+        self._dir_cache = {}  # id(obj) -> (obj, _PrefixIndex of dir(obj))
+        self._dir_cache_generation = -1
+        
+        # Output formats, built once rather than on every highlight pass
+        # Colors for Python elements match the input highlighting
+        self._fmt_keyword = QTextCharFormat()
+        self._fmt_keyword.setForeground(QColor(86, 156, 214))  # Blue
+        self._fmt_keyword.setFontWeight(QFont.Weight.Bold)
+        self._fmt_string = QTextCharFormat()
+        self._fmt_string.setForeground(QColor(206, 145, 120))  # Orange
+        self._fmt_number = QTextCharFormat()
+        self._fmt_number.setForeground(QColor(181, 206, 168))  # Light green
+        self._fmt_comment = QTextCharFormat()
+        self._fmt_comment.setForeground(QColor(106, 153, 85))  # Green
+        self._fmt_error = QTextCharFormat()
+        self._fmt_error.setForeground(QColor(255, 100, 100))  # Red
+        # Keyed by the _HIGHLIGHT_RE group names
+        self._highlight_formats = {
+            'string': self._fmt_string,
+            'comment': self._fmt_comment,
+            'keyword': self._fmt_keyword,
+            'number': self._fmt_number,
+        }
+        
         # Setup syntax highlighting for input
         self.python_highlighter = PythonSyntaxHighlighter(self.document(), self)
         # Also keep JSON highlighter for output
@@ -797,6 +941,8 @@ class TerminalWidget(QTextEdit):
         prompt_format = QTextCharFormat()
         prompt_format.setForeground(QColor(100, 200, 100))  # Green
         cursor.insertText(self.current_prompt, prompt_format)
+        # The prompt may land on a block that was tagged as output
+        cursor.block().setUserState(INPUT_STATE)
         
         self.command_start_position = cursor.position()
         self.last_input_cursor_position = cursor.position()
@@ -811,6 +957,7 @@ class TerminalWidget(QTextEdit):
         cursor.movePosition(QTextCursor.MoveOperation.End)
         
         if output:
+            start_position = cursor.position()
             # Check if output is valid Python and apply highlighting if so
             if self.is_valid_python(output):
                 self.apply_python_highlighting(cursor, output)
@@ -820,6 +967,7 @@ class TerminalWidget(QTextEdit):
             # Only add newline if output doesn't already end with one
             if not output.endswith('\n'):
                 cursor.insertText("\n")
+            self.mark_output_blocks(start_position, cursor.position())
             
         self.setTextCursor(cursor)
         
@@ -831,12 +979,40 @@ class TerminalWidget(QTextEdit):
         # Insert system message with different color
         system_format = QTextCharFormat()
         system_format.setForeground(QColor(200, 200, 100))  # Yellow
+        start_position = cursor.position()
+        cursor.beginEditBlock()
         cursor.insertText(message, system_format)
+        self.mark_output_blocks(start_position, cursor.position())
+        cursor.endEditBlock()
         
         self.setTextCursor(cursor)
         
+    def append_system_message_batch(self, messages: List[str]):
+        """Append several system messages with a single insertion"""
+        if messages:
+            self.append_system_message(''.join(messages))
+        
+    def mark_output_blocks(self, start_pos: int, end_pos: int):
+        """Tag blocks that start inside [start_pos, end_pos) as output so highlighters skip them"""
+        block = self.document().findBlock(start_pos)
+        if block.position() < start_pos:
+            # Output was appended to an existing line - leave that line alone
+            block = block.next()
+        while block.isValid() and block.position() < end_pos:
+            block.setUserState(OUTPUT_STATE)
+            block = block.next()
+        
     def get_current_command(self) -> str:
         """Get the current command being typed"""
+        # Fast path: a single-line command is just the tail of the last block.
+        # Qt positions count UTF-16 units, so only slice when the block has no surrogate pairs.
+        document = self.document()
+        block = document.findBlock(self.command_start_position)
+        if block == document.lastBlock():
+            block_text = block.text()
+            if len(block_text) == block.length() - 1:
+                return block_text[self.command_start_position - block.position():]
+        
         cursor = self.textCursor()
         cursor.setPosition(self.command_start_position)
         cursor.movePosition(QTextCursor.MoveOperation.End, QTextCursor.MoveMode.KeepAnchor)
@@ -871,8 +1047,8 @@ class TerminalWidget(QTextEdit):
         self.setTextCursor(cursor)
         self.ensureCursorVisible()
         
-    def get_completions(self, text: str, cursor_pos: int):
-        """Get tab completions for the given text at cursor position"""
+    def get_completions(self, text: str, cursor_pos: int) -> tuple[List[str], int]:
+        """Get tab completions for the given text at cursor position, plus how many were left out"""
         # Get the word being completed
         words = text[:cursor_pos].split()
         if not words:
@@ -890,39 +1066,73 @@ class TerminalWidget(QTextEdit):
                 
                 try:
                     # Get the object from the Python environment
-                    obj = eval(obj_name, self.python_executor.globals_dict)
+                    obj = self._resolve_object(obj_name)
                     # Get all attributes of the object
-                    attrs = [attr for attr in dir(obj) if attr.startswith(attr_prefix)]
-                    return [f"{obj_name}.{attr}" for attr in attrs]
+                    attrs = self._cached_dir(obj).keys(attr_prefix)
+                    return self._limit_completions([f"{obj_name}.{attr}" for attr in attrs])
                 except:
-                    return []
+                    return [], 0
         else:
             # Complete global variables and functions
-            completions = []
+            completions = set()
             
             # Get from Python executor's globals
-            for name in self.python_executor.globals_dict:
-                if name.startswith(last_word) and not name.startswith('_'):
-                    completions.append(name)
+            completions.update(self._get_global_names().keys(last_word))
             
             # Add Python builtins
-            import builtins
-            for name in dir(builtins):
-                if name.startswith(last_word) and not name.startswith('_'):
-                    completions.append(name)
+            completions.update(self._builtin_names.keys(last_word))
                     
-            return sorted(list(set(completions)))
+            return self._limit_completions(completions)
+    
+    def _resolve_object(self, obj_name: str):
+        """Look up the object whose attributes are being completed"""
+        namespace = self.python_executor.globals_dict
+        names = obj_name.split('.')
+        root = names[0]
+        if all(name.isidentifier() for name in names) and (root in namespace or hasattr(builtins, root)):
+            # Plain dotted names are walked with getattr, like rlcompleter, so nothing is compiled
+            obj = namespace[root] if root in namespace else getattr(builtins, root)
+            for name in names[1:]:
+                obj = getattr(obj, name)
+            return obj
+        # Anything else (subscripts, calls, literals) still needs a full eval
+        return eval(obj_name, namespace)
     
-    def get_all_completions(self):
+    def _get_global_names(self) -> _PrefixIndex:
+        """Return the public global names, re-indexing only after globals may have changed"""
+        generation = self.python_executor.globals_generation
+        if self._global_names_cache is None or self._global_names_cache[0] != generation:
+            index = _PrefixIndex(name for name in self.python_executor.globals_dict if not name.startswith('_'))
+            self._global_names_cache = (generation, index)
+        return self._global_names_cache[1]
+    
+    def _cached_dir(self, obj) -> _PrefixIndex:
+        """Return dir(obj), reusing the result for repeated Tab presses on the same object"""
+        # Code that has run since may have added attributes to objects we've completed on
+        generation = self.python_executor.globals_generation
+        if self._dir_cache_generation != generation:
+            self._dir_cache.clear()
+            self._dir_cache_generation = generation
+        cached = self._dir_cache.get(id(obj))
+        # Keep the object alongside its names so a recycled id() can't return stale results
+        if cached is None or cached[0] is not obj:
+            cached = (obj, _PrefixIndex(self._dir(obj)))
+            self._dir_cache[id(obj)] = cached
+        return cached[1]
+    
+    def get_all_completions(self) -> tuple[List[str], int]:
         """Get all available completions when no input is provided (only new items after pyco.py)"""
-        completions = []
-        
         # Get from Python executor's globals, excluding initial globals
-        for name in self.python_executor.globals_dict:
-            if not name.startswith('_') and name not in self.python_executor.initial_globals:
-                completions.append(name)
+        names = self.python_executor.globals_dict.keys() - self.python_executor.initial_globals
+        completions = {name for name in names if not name.startswith('_')}
                 
-        return sorted(list(set(completions)))
+        return self._limit_completions(completions)
+    
+    def _limit_completions(self, completions) -> tuple[List[str], int]:
+        """Return the first MAX_COMPLETIONS matches in sorted order and how many were dropped"""
+        # A bounded heap avoids sorting every match when the prefix is very short
+        limited = heapq.nsmallest(self.MAX_COMPLETIONS, completions)
+        return limited, len(completions) - len(limited)
         
     def handle_tab_completion(self):
         """Handle tab completion"""
@@ -930,7 +1140,13 @@ class TerminalWidget(QTextEdit):
         cursor = self.textCursor()
         cursor_pos = cursor.position() - self.command_start_position
         
-        completions = self.get_completions(current_command, cursor_pos)
+        # Names make no sense inside a string literal, so indent instead
+        if _ends_inside_string(current_command[:cursor_pos]):
+            cursor.insertText("    ")
+            self.setTextCursor(cursor)
+            return
+        
+        completions, hidden = self.get_completions(current_command, cursor_pos)
         
         if not completions:
             return
@@ -961,18 +1177,17 @@ class TerminalWidget(QTextEdit):
             # Multiple completions - show them
             cursor = self.textCursor()
             cursor.movePosition(QTextCursor.MoveOperation.End)
-            cursor.insertText("\n")
             
-            # Display completions in columns
-            max_width = max(len(comp) for comp in completions)
-            cols = max(1, 80 // (max_width + 2))
+            # Display completions in columns, built as one string so the document is edited once
+            pad = max(len(comp) for comp in completions) + 2
+            cols = max(1, 80 // pad)
             
-            for i, completion in enumerate(completions):
-                if i > 0 and i % cols == 0:
-                    cursor.insertText("\n")
-                cursor.insertText(f"{completion:<{max_width + 2}}")
+            cells = [completion.ljust(pad) for completion in completions]
+            lines = [''.join(cells[i:i + cols]) for i in range(0, len(cells), cols)]
+            if hidden:
+                lines.append(f"({hidden} more...)")
             
-            cursor.insertText("\n")
+            cursor.insertText("\n" + "\n".join(lines) + "\n")
             self.setTextCursor(cursor)
             self.insert_prompt()
             
@@ -1045,30 +1260,15 @@ class TerminalWidget(QTextEdit):
             if cursor.position() <= self.command_start_position:
                 return  # Don't allow backspace before command start
             super().keyPressEvent(event)
-            # Update cursor position after backspace
-            new_cursor = self.textCursor()
-            if new_cursor.position() >= self.command_start_position:
-                self.last_input_cursor_position = new_cursor.position()
+            self._after_edit()
         elif key == Qt.Key.Key_Left:
             if cursor.position() <= self.command_start_position:
                 return  # Don't allow moving left before command start
             super().keyPressEvent(event)
-            # Update cursor position after move
-            new_cursor = self.textCursor()
-            if new_cursor.position() >= self.command_start_position:
-                self.last_input_cursor_position = new_cursor.position()
-                # Mark that user has navigated within input
-                if self.is_in_multiline_input():
-                    self.user_navigated_within_input = True
+            self._after_edit(navigated=True)
         elif key == Qt.Key.Key_Right:
             super().keyPressEvent(event)
-            # Update cursor position after move
-            new_cursor = self.textCursor()
-            if new_cursor.position() >= self.command_start_position:
-                self.last_input_cursor_position = new_cursor.position()
-                # Mark that user has navigated within input
-                if self.is_in_multiline_input():
-                    self.user_navigated_within_input = True
+            self._after_edit(navigated=True)
         elif modifiers & Qt.KeyboardModifier.ControlModifier:
             if key == Qt.Key.Key_C:
                 self.handle_ctrl_c()
@@ -1105,6 +1305,15 @@ class TerminalWidget(QTextEdit):
                     self.last_input_cursor_position = cursor.position()
                 super().keyPressEvent(event)
                 
+    def _after_edit(self, navigated: bool = False):
+        """Record where the cursor ended up after Qt handled a key in the input area"""
+        position = self.textCursor().position()
+        if position >= self.command_start_position:
+            self.last_input_cursor_position = position
+            # Mark that user has navigated within input
+            if navigated and self.is_in_multiline_input():
+                self.user_navigated_within_input = True
+        
     def handle_shift_return(self):
         """Handle Shift+Enter key press - add a new line for multi-line input"""
         cursor = self.textCursor()
@@ -1170,9 +1379,14 @@ class TerminalWidget(QTextEdit):
                 return
         
         if command.strip():
-            # Add to history
-            if not self.command_history or self.command_history[-1] != command:
-                self.command_history.append(command)
+            # Add to history, dropping the earlier copy if it repeats a recent entry
+            # (e.g. alternating between two commands) so Up still returns what just ran
+            recent = itertools.islice(reversed(self.command_history), self.HISTORY_DEDUP_WINDOW)
+            for offset, entry in enumerate(recent):
+                if entry == command:
+                    del self.command_history[-1 - offset]
+                    break
+            self.command_history.append(command)
             self.history_index = len(self.command_history)
             
             # Execute command
@@ -1231,24 +1445,28 @@ class TerminalWidget(QTextEdit):
         text = text.strip()
         if not text:
             return False
+        # Any valid expression is also a valid module, so one parse without bytecode is enough
         try:
-            compile(text, '<string>', 'eval')
+            ast.parse(text)
             return True
-        except SyntaxError:
-            try:
-                compile(text, '<string>', 'exec')
-                return True
-            except SyntaxError:
-                return False
+        except (SyntaxError, ValueError):
+            return False
     
     def apply_python_highlighting(self, cursor: QTextCursor, text: str):
         """Apply Python syntax highlighting to the given text"""
-        # Insert the text first without any formatting
-        start_position = cursor.position()
-        cursor.insertText(text)
-        
-        # Now apply formatting using regex patterns
-        self.highlight_python_in_range(start_position, start_position + len(text))
+        # Group the insert and every format change into one edit so Qt relays out once
+        cursor.beginEditBlock()
+        try:
+            # Insert the text first without any formatting
+            start_position = cursor.position()
+            cursor.insertText(text)
+            # Tag before formatting so the format changes don't re-run the highlighters
+            self.mark_output_blocks(start_position, cursor.position())
+            
+            # Now apply formatting using regex patterns
+            self.highlight_python_in_range(start_position, start_position + len(text))
+        finally:
+            cursor.endEditBlock()
         
     def highlight_python_in_range(self, start_pos: int, end_pos: int):
         """Apply Python highlighting to a specific range in the document"""
@@ -1260,106 +1478,14 @@ class TerminalWidget(QTextEdit):
         cursor.setPosition(end_pos, QTextCursor.MoveMode.KeepAnchor)
         text = cursor.selectedText()
         
-        # Define colors for Python elements (same as input highlighting)
-        keyword_color = QColor(86, 156, 214)  # Blue
-        string_color = QColor(206, 145, 120)   # Orange  
-        comment_color = QColor(106, 153, 85)   # Green
-        number_color = QColor(181, 206, 168)   # Light green
-        
-        # Highlight Python keywords
-        keyword_format = QTextCharFormat()
-        keyword_format.setForeground(keyword_color)
-        keyword_format.setFontWeight(QFont.Weight.Bold)
-        
-        import re
-        python_keywords = [
-            'and', 'as', 'assert', 'break', 'class', 'continue', 'def', 'del',
-            'elif', 'else', 'except', 'finally', 'for', 'from', 'global', 'if',
-            'import', 'in', 'is', 'lambda', 'nonlocal', 'not', 'or', 'pass',
-            'raise', 'return', 'try', 'while', 'with', 'yield', 'True', 'False',
-            'None', 'async', 'await'
-        ]
-        
-        for keyword in python_keywords:
-            keyword_pattern = r'\b' + re.escape(keyword) + r'\b'
-            for match in re.finditer(keyword_pattern, text):
-                # Make sure it's not inside a string
-                if not self.is_position_in_python_string(text, match.start()):
-                    cursor.setPosition(start_pos + match.start())
-                    cursor.setPosition(start_pos + match.end(), QTextCursor.MoveMode.KeepAnchor)
-                    cursor.setCharFormat(keyword_format)
-                    
-        # Highlight Python strings first (they have priority)
-        string_format = QTextCharFormat()
-        string_format.setForeground(string_color)
-        
-        # Find all Python strings (single and double quotes)
-        string_patterns = [
-            r'"(?:[^"\\]|\\.)*"',  # Double quotes
-            r"'(?:[^'\\]|\\.)*'"   # Single quotes
-        ]
-        
-        for pattern in string_patterns:
-            for match in re.finditer(pattern, text):
-                cursor.setPosition(start_pos + match.start())
-                cursor.setPosition(start_pos + match.end(), QTextCursor.MoveMode.KeepAnchor)
-                cursor.setCharFormat(string_format)
-                
-        # Highlight Python numbers
-        number_format = QTextCharFormat()
-        number_format.setForeground(number_color)
-        
-        number_pattern = r'\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b'
-        for match in re.finditer(number_pattern, text):
-            # Make sure it's not inside a string
-            if not self.is_position_in_python_string(text, match.start()):
-                cursor.setPosition(start_pos + match.start())
-                cursor.setPosition(start_pos + match.end(), QTextCursor.MoveMode.KeepAnchor)
-                cursor.setCharFormat(number_format)
-                
-        # Highlight Python comments
-        comment_format = QTextCharFormat()
-        comment_format.setForeground(comment_color)
-        
-        comment_pattern = r'#.*$'
-        for match in re.finditer(comment_pattern, text, re.MULTILINE):
-            # Make sure it's not inside a string
-            if not self.is_position_in_python_string(text, match.start()):
-                cursor.setPosition(start_pos + match.start())
-                cursor.setPosition(start_pos + match.end(), QTextCursor.MoveMode.KeepAnchor)
-                cursor.setCharFormat(comment_format)
-                
-    def is_position_in_python_string(self, text: str, pos: int) -> bool:
-        """Check if position is inside a Python string"""
-        # Count unescaped quotes (both single and double) before this position
-        double_quote_count = 0
-        single_quote_count = 0
-        i = 0
-        while i < pos:
-            if text[i] == '"':
-                # Check if it's escaped
-                escape_count = 0
-                j = i - 1
-                while j >= 0 and text[j] == '\\':
-                    escape_count += 1
-                    j -= 1
-                # If even number of escapes (including 0), quote is not escaped
-                if escape_count % 2 == 0:
-                    double_quote_count += 1
-            elif text[i] == "'":
-                # Check if it's escaped  
-                escape_count = 0
-                j = i - 1
-                while j >= 0 and text[j] == '\\':
-                    escape_count += 1
-                    j -= 1
-                # If even number of escapes (including 0), quote is not escaped
-                if escape_count % 2 == 0:
-                    single_quote_count += 1
-            i += 1
-        # If odd number of quotes, we're inside a string
-        return (double_quote_count % 2 == 1) or (single_quote_count % 2 == 1)
+        formats = self._highlight_formats
         
+        # A single pass finds every token; the matching group picks its format
+        for match in _HIGHLIGHT_RE.finditer(text):
+            cursor.setPosition(start_pos + match.start())
+            cursor.setPosition(start_pos + match.end(), QTextCursor.MoveMode.KeepAnchor)
+            cursor.setCharFormat(formats[match.lastgroup])
+                
     def is_position_inside_json_string(self, text: str, pos: int) -> bool:
         """Check if position is inside a JSON string"""
         in_string = False
@@ -1386,18 +1512,18 @@ class TerminalWidget(QTextEdit):
         cursor.movePosition(QTextCursor.MoveOperation.End)
         
         if output:
+            start_position = cursor.position()
             # Format output
             if is_error:
-                error_format = QTextCharFormat()
-                error_format.setForeground(QColor(255, 100, 100))  # Red
-                cursor.insertText(output, error_format)
+                cursor.insertText(output, self._fmt_error)
             else:
                 # Check if output is valid Python and apply highlighting if so
-                if self.is_valid_python(output):
+                if _LIKELY_CODE_RE.search(output) and self.is_valid_python(output):
                     self.apply_python_highlighting(cursor, output)
                 else:
                     cursor.insertText(output)
             cursor.insertText("\n")
+            self.mark_output_blocks(start_position, cursor.position())
             
         self.setTextCursor(cursor)
         self.insert_prompt()
@@ -1439,10 +1565,27 @@ class TerminalWidget(QTextEdit):
 class PythonREPLTerminal(QMainWindow):
     """Main application window"""
     
+    MENUS_WIDTH = 150  # Approximate width of "File" and "Help" menus with padding
+    BUTTONS_WIDTH = 130  # Minimize button + power button + extra margins and spacing
+    RESIZE_SETTLE_MS = 50  # Drag spacer is resized once the window stops changing size
+    DOWNLOAD_TIMEOUT_MS = 10000
+    
     def __init__(self):
         super().__init__()
         self.install_dir = self.get_app_data_dir()
         self.drag_start_position = None
+        self._pyco_code_cache: Optional[tuple[tuple[str, int, int], CodeType]] = None  # (path, mtime_ns, size), code
+        self._stdout_capture = io.StringIO()  # Reused to capture output of pyco.py and customization scripts
+        self._network = None  # Created on first download
+        self._download_replies = []  # Replies for the download in progress
+        self._download_error = ""  # First failure of the current download, if any
+        self._downloads_pending = 0
+        
+        # Coalesce the burst of resize events from a live window resize into one update
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(self.RESIZE_SETTLE_MS)
+        self._resize_timer.timeout.connect(self._apply_drag_width)
         self.update_available = False
         self.file_menu = None  # Will be set in setup_menus
         self.update_pyco_action = None  # Will be set in setup_menus
@@ -1703,6 +1846,10 @@ class PythonREPLTerminal(QMainWindow):
         self.inner_color = (36, 64, 36)  # #244024
         self.outer_color = (27, 48, 27)  # #1b301b
         
+        # Layer stylesheet computed for (inner_color, outer_color), reused until the colors change
+        self._color_cache_key = None
+        self._color_style = ""
+        
     def apply_static_colors(self):
         """Apply static border colors after border layers are created"""
         self.update_colors()
@@ -1715,6 +1862,7 @@ class PythonREPLTerminal(QMainWindow):
         # Create 6 layers
         for i in range(6):
             layer = QWidget()
+            layer.setObjectName(f"borderLayer{i}")  # Targeted by the stylesheet from update_colors
             layout_obj = QVBoxLayout(layer)
             layout_obj.setContentsMargins(2, 2, 2, 2)
             
@@ -1738,65 +1886,77 @@ class PythonREPLTerminal(QMainWindow):
         if not hasattr(self, 'border_layers') or not self.border_layers:
             return
             
-        # Use static colors
-        inner_r, inner_g, inner_b = self.inner_color
-        outer_r, outer_g, outer_b = self.outer_color
+        key = (self.inner_color, self.outer_color)
+        if key != self._color_cache_key:
+            # Use static colors
+            inner_r, inner_g, inner_b = self.inner_color
+            outer_r, outer_g, outer_b = self.outer_color
+            
+            # Calculate even fade steps for 6 layers (i=0 is outermost, i=5 is innermost)
+            # Integer weights give the same truncated values as the float fade
+            colors = [
+                ((outer_r * (5 - i) + inner_r * i) // 5,
+                 (outer_g * (5 - i) + inner_g * i) // 5,
+                 (outer_b * (5 - i) + inner_b * i) // 5)
+                for i in range(6)
+            ]
+            
+            # Each layer's rule also covers its descendants, like a per-layer "QWidget { }" sheet.
+            # Rules tie on specificity, so listing the innermost layer last lets it win.
+            self._color_style = "\n".join(
+                f"QWidget#borderLayer{i}, #borderLayer{i} QWidget {{ "
+                f"background-color: rgb({r}, {g}, {b}); border: 2px solid rgb({r}, {g}, {b}); }}"
+                for i, (r, g, b) in enumerate(colors)
+            )
+            self._color_cache_key = key
         
-        # Calculate even fade steps for 6 layers
-        colors = []
-        for i in range(6):
-            # i=0 is outermost, i=5 is innermost
-            factor = i / 5.0  # 0.0 to 1.0 for even fade
-            r = int(outer_r + (inner_r - outer_r) * factor)
-            g = int(outer_g + (inner_g - outer_g) * factor)
-            b = int(outer_b + (inner_b - outer_b) * factor)
-            colors.append((r, g, b))
-        
-        # Apply colors to layers
-        for i, (r, g, b) in enumerate(colors):
-            style = f"QWidget {{ background-color: rgb({r}, {g}, {b}); border: 2px solid rgb({r}, {g}, {b}); }}"
-            if i < len(self.border_layers):
-                self.border_layers[i].setStyleSheet(style)
-        
-    def load_pyco_file(self):
-        """Load pyco.py into the Python environment"""
+        # Apply colors to all layers with one stylesheet so Qt only re-polishes once
+        self.border_layers[0].setStyleSheet(self._color_style)
+        
+    def _reset_stdout_capture(self) -> io.StringIO:
+        """Empty and return the shared buffer used to capture script output"""
+        self._stdout_capture.seek(0)
+        self._stdout_capture.truncate()
+        return self._stdout_capture
+        
+    def load_pyco_file(self, messages: List[str]):
+        """Load pyco.py into the Python environment, collecting its output in messages"""
         pyco_path = os.path.join(self.install_dir, "pyco.py")
         
         if os.path.exists(pyco_path):
             try:
-                # Load pyco.py into the Python executor's globals
-                with open(pyco_path, 'r', encoding='utf-8') as f:
-                    pyco_code = f.read()
+                # Load pyco.py into the Python executor's globals, recompiling only if the file changed
+                stat = os.stat(pyco_path)
+                key = (pyco_path, stat.st_mtime_ns, stat.st_size)
+                if self._pyco_code_cache is None or self._pyco_code_cache[0] != key:
+                    pyco_source = _read_text(pyco_path)
+                    self._pyco_code_cache = (key, compile(pyco_source, pyco_path, 'exec'))
+                pyco_code = self._pyco_code_cache[1]
                 
                 # Execute pyco.py in the Python environment with proper stdout capture
-                import io
-                old_stdout = sys.stdout
-                stdout_capture = io.StringIO()
-                
-                try:
-                    sys.stdout = stdout_capture
+                stdout_capture = self._reset_stdout_capture()
+                with contextlib.redirect_stdout(stdout_capture):
                     exec(pyco_code, self.terminal.python_executor.globals_dict)
-                    
-                    # Get any output from pyco.py execution and display it
-                    output = stdout_capture.getvalue()
-                    if output.strip():
-                        # Remove only leading newlines to avoid extra space at top, preserve indentation
-                        clean_output = output.lstrip('\n')
-                        self.terminal.append_system_message(clean_output)
-                finally:
-                    sys.stdout = old_stdout
+                self.terminal.python_executor.globals_generation += 1
+                
+                # Get any output from pyco.py execution and display it
+                output = stdout_capture.getvalue()
+                if output.strip():
+                    # Remove only leading newlines to avoid extra space at top, preserve indentation
+                    clean_output = output.lstrip('\n')
+                    messages.append(clean_output)
                 
                 # Check for updates after successful load
                 self.check_for_updates()
                     
                 return True
             except Exception as e:
-                self.terminal.append_system_message(f"Error loading pyco.py: {str(e)}\n")
+                messages.append(f"Error loading pyco.py: {str(e)}\n")
                 return False
         return False
 
-    def load_customization_url_script(self):
-        """Fetch and execute the saved customization URL, if any"""
+    def load_customization_url_script(self, messages: List[str]):
+        """Fetch and execute the saved customization URL, if any, collecting its output in messages"""
         settings = self.load_settings()
         url = settings.get("customization_url", "").strip()
         if not url:
@@ -1805,25 +1965,22 @@ class PythonREPLTerminal(QMainWindow):
         try:
             code, resolved_url = fetch_text_url(url, timeout=10)
         except Exception as e:
-            self.terminal.append_system_message(f"Warning: could not load customization from {url}: {e}\n")
+            messages.append(f"Warning: could not load customization from {url}: {e}\n")
             return
 
         if resolved_url != url:
-            self.terminal.append_system_message(f"Loading customizations from {resolved_url}\n")
+            messages.append(f"Loading customizations from {resolved_url}\n")
 
         try:
-            old_stdout = sys.stdout
-            stdout_capture = io.StringIO()
-            try:
-                sys.stdout = stdout_capture
+            stdout_capture = self._reset_stdout_capture()
+            with contextlib.redirect_stdout(stdout_capture):
                 exec(code, self.terminal.python_executor.globals_dict)
-                output = stdout_capture.getvalue()
-                if output.strip():
-                    self.terminal.append_system_message(output.lstrip('\n'))
-            finally:
-                sys.stdout = old_stdout
+            self.terminal.python_executor.globals_generation += 1
+            output = stdout_capture.getvalue()
+            if output.strip():
+                messages.append(output.lstrip('\n'))
         except Exception as e:
-            self.terminal.append_system_message(f"Error in customization script: {e}\n")
+            messages.append(f"Error in customization script: {e}\n")
 
     def prompt_load_customizations(self):
         """Ask the user for a customization URL and save it"""
@@ -1845,7 +2002,9 @@ class PythonREPLTerminal(QMainWindow):
             settings.pop("customization_url", None)
         self.save_settings(settings)
         if url:
-            self.load_customization_url_script()
+            messages = []
+            self.load_customization_url_script(messages)
+            self.terminal.append_system_message_batch(messages)
         
     def check_pyco_file(self):
         """Check if pyco.py exists, load it if it does, or offer to download if not"""
@@ -1853,10 +2012,12 @@ class PythonREPLTerminal(QMainWindow):
         
         if os.path.exists(pyco_path):
             # Load the existing pyco.py file
-            if self.load_pyco_file():
+            messages = []
+            if self.load_pyco_file(messages):
                 # Load any saved customization script after pyco is imported
-                self.load_customization_url_script()
-            # Insert prompt after loading is complete
+                self.load_customization_url_script(messages)
+            # Show everything loading printed, then the prompt
+            self.terminal.append_system_message_batch(messages)
             self.terminal.insert_prompt()
         else:
             # Add message to terminal about missing pyco.py
@@ -1875,16 +2036,70 @@ class PythonREPLTerminal(QMainWindow):
         self.progress_dialog.setMinimumDuration(0)
         self.progress_dialog.show()
         
-        self.downloader = PycoDownloader(self.install_dir)
-        self.downloader.download_finished.connect(self.on_download_finished)
-        self.progress_dialog.canceled.connect(self.downloader.terminate)
-        self.downloader.start()
+        if self._network is None:
+            self._network = QNetworkAccessManager(self)
+        self._download_replies = []
+        self._download_error = ""
+        self._downloads_pending = 0
+        for url, name in ((PYCO_URL, "pyco.py"), (README_URL, "README.md")):
+            request = QNetworkRequest(QUrl(url))
+            for header, value in HTTP_HEADERS.items():
+                request.setRawHeader(header.encode(), value.encode())
+            request.setTransferTimeout(self.DOWNLOAD_TIMEOUT_MS)
+            reply = self._network.get(request)
+            reply.finished.connect(lambda reply=reply, name=name: self._on_download_reply(reply, name))
+            self._download_replies.append(reply)
+            self._downloads_pending += 1
+        self.progress_dialog.canceled.connect(self._cancel_download)
+        
+    def _cancel_download(self):
+        """Abort any downloads still in flight"""
+        self._download_error = self._download_error or "Download cancelled"
+        for reply in self._download_replies:
+            if reply.isRunning():
+                reply.abort()
+        
+    def _on_download_reply(self, reply: QNetworkReply, name: str):
+        """Save one finished download, reporting once both files are done"""
+        reply.deleteLater()
+        self._downloads_pending -= 1
+        
+        if not self._download_error:
+            status = reply.attribute(QNetworkRequest.Attribute.HttpStatusCodeAttribute)
+            if status is not None and status != 200:
+                reason = reply.attribute(QNetworkRequest.Attribute.HttpReasonPhraseAttribute)
+                self._download_error = f"Network error: HTTP Error {status}: {reason}"
+            elif reply.error() != QNetworkReply.NetworkError.NoError:
+                self._download_error = f"Network error: {reply.errorString()}"
+            else:
+                path = os.path.join(self.install_dir, name)
+                # Write next to the target and swap it in at the end so a failed
+                # download never leaves a truncated pyco.py behind
+                partial_path = path + ".part"
+                try:
+                    Path(partial_path).write_bytes(_CRLF_BYTES_RE.sub(b'\n', reply.readAll().data()))
+                    os.replace(partial_path, path)
+                except Exception as e:
+                    self._download_error = f"Download failed: {e}"
+                finally:
+                    if os.path.exists(partial_path):
+                        os.remove(partial_path)
+                    
+        if self._downloads_pending == 0:
+            self._download_replies = []
+            if self._download_error:
+                self.on_download_finished(False, self._download_error)
+            else:
+                self.on_download_finished(True, "Downloaded pyco.py and README.md")
+        elif self._download_error:
+            self._cancel_download()  # No point finishing the other file
         
     @pyqtSlot(bool, str)
     def on_download_finished(self, success: bool, message: str):
         """Handle download completion"""
         self.progress_dialog.hide()
         
+        messages = []
         if success:
             # Check if this was an update (pyco.py already existed) or initial download
             pyco_path = os.path.join(self.install_dir, "pyco.py")
@@ -1892,19 +2107,20 @@ class PythonREPLTerminal(QMainWindow):
             
             if was_update:
                 # This was an update - just show message, don't reload
-                self.terminal.append_system_message("Updated pyco. Restart for more happy calculating!\n")
+                messages.append("Updated pyco. Restart for more happy calculating!\n")
             else:
                 # This was initial download - load the file
-                self.terminal.append_system_message(f"✓ {message}\n")
-                if self.load_pyco_file():
-                    self.load_customization_url_script()
+                messages.append(f"✓ {message}\n")
+                if self.load_pyco_file(messages):
+                    self.load_customization_url_script(messages)
                     # File loaded successfully - don't show the loading message
                     pass
                 else:
-                    self.terminal.append_system_message("Error: Could not load pyco.py after download\n")
+                    messages.append("Error: Could not load pyco.py after download\n")
         else:
-            self.terminal.append_system_message(f"✗ {message}\n")
+            messages.append(f"✗ {message}\n")
             
+        self.terminal.append_system_message_batch(messages)
         self.terminal.pyco_download_pending = False
         self.terminal.insert_prompt()
         
@@ -2073,16 +2289,18 @@ class PythonREPLTerminal(QMainWindow):
     def _calculate_drag_spacer_width(self):
         """Calculate the width for the drag spacer based on window and menu dimensions"""
         menubar_width = self.width() if hasattr(self, 'width') else 800
-        estimated_menus_width = 150  # Approximate width of "File" and "Help" menus with padding
-        button_width = 130  # Minimize button + power button + extra margins and spacing
         # Use a smaller minimum to allow narrower windows without hiding menus
-        drag_width = max(50, menubar_width - estimated_menus_width - button_width)
+        drag_width = max(50, menubar_width - self.MENUS_WIDTH - self.BUTTONS_WIDTH)
         return drag_width
     
     def resizeEvent(self, event):
         """Handle window resize to update drag spacer width"""
         super().resizeEvent(event)
+        # Restarting the timer defers the update until resizing settles
+        self._resize_timer.start()
         
+    def _apply_drag_width(self):
+        """Update the drag spacer width for the current window size"""
         # Only update drag spacer width if we're not currently dragging
         if hasattr(self, 'drag_spacer') and self.drag_start_position is None:
             drag_width = self._calculate_drag_spacer_width()
@@ -2122,8 +2340,7 @@ class PythonREPLTerminal(QMainWindow):
             return
             
         try:
-            with open(readme_path, 'r', encoding='utf-8') as f:
-                readme_content = f.read()
+            readme_content = _read_text(readme_path)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Could not read README.md: {e}")
             return
@@ -2140,201 +2357,21 @@ class PythonREPLTerminal(QMainWindow):
             layout.addWidget(self.help_browser)
         
         # Update content and show window
-        html_content = self.markdown_to_html(readme_content)
-        self.help_browser.setHtml(html_content)
+        # Qt's markdown importer ignores stylesheets, so set the body font and text colour directly
+        document = self.help_browser.document()
+        font = QFont(self.help_browser.font())
+        font.setFamilies(_MD_BODY_FONTS)
+        document.setDefaultFont(font)
+        palette = self.help_browser.palette()
+        palette.setColor(QPalette.ColorRole.Text, QColor("#333"))
+        self.help_browser.setPalette(palette)
+        document.setMarkdown(readme_content, QTextDocument.MarkdownFeature.MarkdownDialectGitHub)
         
         # Show as non-modal window
         self.help_window.show()
         self.help_window.raise_()
         self.help_window.activateWindow()
         
-    def markdown_to_html(self, markdown_text):
-        """Convert markdown to HTML with comprehensive support"""
-        lines = markdown_text.split('\n')
-        html_lines = []
-        in_code_block = False
-        in_list = False
-        code_block_content = []
-        code_block_lang = ""
-        
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-            stripped = line.strip()
-            
-            # Handle code blocks (multi-line fences)
-            if stripped.startswith('```'):
-                if not in_code_block:
-                    in_code_block = True
-                    code_block_lang = stripped[3:].strip()
-                    code_block_content = []
-                else:
-                    in_code_block = False
-                    # Process the collected code block content
-                    escaped_content = '\n'.join(line.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;') for line in code_block_content)
-                    lang_class = f' class="language-{code_block_lang}"' if code_block_lang else ''
-                    lang_label = f'<div style="background-color: #e0e0e0; padding: 2px 8px; font-size: 1.6em; color: #666; border-bottom: 1px solid #ccc;">{code_block_lang}</div>' if code_block_lang else ''
-                    html_lines.append(f'<div style="border: 1px solid #ddd; border-radius: 5px; margin: 8px 0; overflow: hidden;">{lang_label}<pre{lang_class} style="background-color: #f8f8f8; padding: 15px; margin: 0; font-family: \'Courier New\', Consolas, monospace; font-size: 1.8em; line-height: 1.0; overflow-x: auto; white-space: pre-wrap;">{escaped_content}</pre></div>')
-                i += 1
-                continue
-            
-            if in_code_block:
-                # Collect lines for the code block
-                code_block_content.append(line)
-                i += 1
-                continue
-            
-            # Handle headers
-            if stripped.startswith('# '):
-                html_lines.append(f'<h1 style="color: #333; border-bottom: 2px solid #ccc; padding-bottom: 5px;">{stripped[2:]}</h1>')
-            elif stripped.startswith('## '):
-                html_lines.append(f'<h2 style="color: #444; border-bottom: 1px solid #ddd; padding-bottom: 3px;">{stripped[3:]}</h2>')
-            elif stripped.startswith('### '):
-                html_lines.append(f'<h3 style="color: #555;">{stripped[4:]}</h3>')
-            elif stripped.startswith('#### '):
-                html_lines.append(f'<h4 style="color: #666;">{stripped[5:]}</h4>')
-            elif stripped.startswith('##### '):
-                html_lines.append(f'<h5 style="color: #777;">{stripped[6:]}</h5>')
-            elif stripped.startswith('###### '):
-                html_lines.append(f'<h6 style="color: #888;">{stripped[7:]}</h6>')
-            
-            # Handle lists
-            elif stripped.startswith('- ') or stripped.startswith('* '):
-                if not in_list:
-                    html_lines.append('<ul style="margin: 5px 0; padding-left: 20px;">')
-                    in_list = True
-                content = self._format_inline_markdown(stripped[2:])
-                html_lines.append(f'<li style="margin: 2px 0;">{content}</li>')
-            elif re.match(r'^\d+\. ', stripped):
-                if not in_list:
-                    html_lines.append('<ol style="margin: 5px 0; padding-left: 20px;">')
-                    in_list = True
-                content = self._format_inline_markdown(re.sub(r'^\d+\. ', '', stripped))
-                html_lines.append(f'<li style="margin: 3px 0;">{content}</li>')
-            else:
-                # Close list if we were in one
-                if in_list:
-                    html_lines.append('</ul>' if any(l.strip().startswith(('- ', '* ')) for l in lines[:i] if l.strip()) else '</ol>')
-                    in_list = False
-                
-                # Handle tables
-                if '|' in stripped and i + 1 < len(lines):
-                    next_line = lines[i + 1].strip()
-                    # Check if next line is a table separator (contains | and -)
-                    if '|' in next_line and '-' in next_line:
-                        # This looks like a table
-                        table_rows = []
-                        table_start = i
-                        
-                        # Collect all table rows
-                        while i < len(lines) and '|' in lines[i].strip():
-                            table_rows.append(lines[i].strip())
-                            i += 1
-                        
-                        if len(table_rows) >= 2:
-                            # Process the table
-                            html_lines.append('<table style="border-collapse: collapse; margin: 8px 0; width: 100%;">')
-                            
-                            # Header row
-                            header_cells = [cell.strip() for cell in table_rows[0].split('|')[1:-1]]  # Remove empty first/last
-                            html_lines.append('<thead>')
-                            html_lines.append('<tr>')
-                            for cell in header_cells:
-                                content = self._format_inline_markdown(cell)
-                                html_lines.append(f'<th style="border: 1px solid #ddd; padding: 8px; background-color: #f5f5f5; text-align: left; font-weight: bold;">{content}</th>')
-                            html_lines.append('</tr>')
-                            html_lines.append('</thead>')
-                            
-                            # Body rows (skip separator row at index 1)
-                            if len(table_rows) > 2:
-                                html_lines.append('<tbody>')
-                                for row in table_rows[2:]:
-                                    cells = [cell.strip() for cell in row.split('|')[1:-1]]  # Remove empty first/last
-                                    html_lines.append('<tr>')
-                                    for cell in cells:
-                                        content = self._format_inline_markdown(cell)
-                                        html_lines.append(f'<td style="border: 1px solid #ddd; padding: 8px;">{content}</td>')
-                                    html_lines.append('</tr>')
-                                html_lines.append('</tbody>')
-                            
-                            html_lines.append('</table>')
-                        
-                        i -= 1  # Adjust because the outer loop will increment
-                        i += 1
-                        continue
-                
-                # Handle blockquotes
-                if stripped.startswith('> '):
-                    content = self._format_inline_markdown(stripped[2:])
-                    html_lines.append(f'<blockquote style="margin: 5px 0; padding: 10px; border-left: 4px solid #ddd; background-color: #f9f9f9; font-style: italic;">{content}</blockquote>')
-                
-                # Handle indented code blocks (4 spaces or 1 tab)
-                elif line.startswith('    ') or line.startswith('\t'):
-                    # Collect consecutive indented lines
-                    code_lines = []
-                    while i < len(lines) and (lines[i].startswith('    ') or lines[i].startswith('\t') or not lines[i].strip()):
-                        if lines[i].startswith('    '):
-                            code_lines.append(lines[i][4:])  # Remove 4 spaces
-                        elif lines[i].startswith('\t'):
-                            code_lines.append(lines[i][1:])  # Remove 1 tab
-                        else:
-                            code_lines.append(lines[i])  # Empty line
-                        i += 1
-                    
-                    # Remove trailing empty lines
-                    while code_lines and not code_lines[-1].strip():
-                        code_lines.pop()
-                    
-                    if code_lines:
-                        escaped_code = '\n'.join(line.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;') for line in code_lines)
-                        html_lines.append(f'<div style="border: 1px solid #ddd; border-radius: 5px; margin: 8px 0; overflow: hidden;"><pre style="background-color: #f8f8f8; padding: 15px; margin: 0; font-family: \'Courier New\', Consolas, monospace; font-size: 1.8em; line-height: 1.0; overflow-x: auto; white-space: pre-wrap;">{escaped_code}</pre></div>')
-                    
-                    i -= 1  # Adjust because the outer loop will increment
-                
-                # Handle horizontal rules
-                elif stripped in ['---', '***', '___']:
-                    html_lines.append('<hr style="margin: 15px 0; border: none; border-top: 1px solid #ccc;">')
-                
-                # Handle regular paragraphs
-                elif stripped:
-                    content = self._format_inline_markdown(stripped)
-                    html_lines.append(f'<p style="margin: 5px 0; line-height: 1.0;">{content}</p>')
-                
-                # Handle empty lines - just skip them (they naturally separate paragraphs)
-                else:
-                    pass
-            
-            i += 1
-        
-        # Close any remaining lists
-        if in_list:
-            html_lines.append('</ul>')
-        
-        return f'<html><head><style>body {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif; font-size: 2em; line-height: 1.0; color: #333; max-width: 800px; margin: 0 auto; padding: 20px; }}</style></head><body>{"".join(html_lines)}</body></html>'
-    
-    def _format_inline_markdown(self, text):
-        """Format inline markdown elements"""
-        # Handle code spans first (to avoid conflicts)
-        text = re.sub(r'`([^`]+)`', r'<code style="background-color: #f0f0f0; padding: 2px 4px; border-radius: 3px; font-family: monospace;">\1</code>', text)
-        
-        # Handle bold and italic (order matters)
-        text = re.sub(r'\*\*\*([^*]+)\*\*\*', r'<strong><em>\1</em></strong>', text)  # Bold + italic
-        text = re.sub(r'\*\*([^*]+)\*\*', r'<strong>\1</strong>', text)  # Bold
-        text = re.sub(r'\*([^*]+)\*', r'<em>\1</em>', text)  # Italic
-        
-        # Handle alternative bold/italic syntax
-        text = re.sub(r'___([^_]+)___', r'<strong><em>\1</em></strong>', text)
-        text = re.sub(r'__([^_]+)__', r'<strong>\1</strong>', text)
-        text = re.sub(r'_([^_]+)_', r'<em>\1</em>', text)
-        
-        # Handle links
-        text = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'<a href="\2" style="color: #0066cc; text-decoration: none;" onmouseover="this.style.textDecoration=\'underline\'" onmouseout="this.style.textDecoration=\'none\'">\1</a>', text)
-        
-        # Handle strikethrough
-        text = re.sub(r'~~([^~]+)~~', r'<del>\1</del>', text)
-        
-        return text
-
 def main():
     """Main application entry point"""
     # Windows-specific: Set App User Model ID for proper taskbar grouping and icon